@@ -1,55 +1,182 @@
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 import matplotlib.ticker as ticker
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from matplotlib.table import Table
+from matplotlib.figure import Figure
 import tkinter as tk
 from tkinter import Text, Scrollbar, Checkbutton, IntVar
 from io import StringIO
+from concurrent.futures import ThreadPoolExecutor
 import hashlib
 import os
+import queue
 import re
+import threading
+import warnings
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pa_csv
+except ImportError:
+    pa = None
+    pc = None
+    pa_csv = None
+
+try:
+    import numba
+    from numba.core.errors import NumbaTypeSafetyWarning
+    # pandas' groupby kernel triggers a harmless uint64 -> int64 cast warning while compiling
+    warnings.filterwarnings('ignore', category=NumbaTypeSafetyWarning)
+    # The kernel is first launched off the main thread; TBB hangs interpreter exit when started that way
+    numba.config.THREADING_LAYER_PRIORITY = ['omp', 'workqueue', 'tbb']
+except ImportError:
+    numba = None
+
+try:
+    import polars as pl
+except ImportError:
+    pl = None
+
+# Copy-on-Write lets filtered frames share column buffers until written; always on from pandas 3.0
+if int(pd.__version__.split('.')[0]) < 3:
+    pd.options.mode.copy_on_write = True
+
+
+# Parse CSVs with the multithreaded pyarrow reader when it is installed
+USE_PYARROW_CSV = True
+# Load all yearly CSVs with a single polars query when polars is installed
+USE_POLARS = True
+
+# Column positions in the source CSV and the fixed names assigned to them
+CSV_USECOLS = [4, 16, 17, 18, 19, 20, 21, 22, 23, 24, 25, 26]
+COLUMN_NAMES = ['Category', 'Item Key', 'Name', 'Quantity', 'Purchase Cost', 'Hours', 'T/O', 'Income', 'ROI', 'Avg Yrl ROI', 'Subrental', 'Repair']
+NUMERIC_COLS = ['Quantity', 'Purchase Cost', 'Hours', 'T/O', 'Income', 'ROI', 'Avg Yrl ROI', 'Subrental', 'Repair']
+STRING_COLS = ['Category', 'Item Key', 'Name']
+NA_VALUES = ['N/A', '-', '']
+# Rows parsed per chunk by the C engine, bounding peak memory on large files
+CSV_CHUNKSIZE = 200_000
+
+# Category families behind the group/include checkboxes
+TRADE_SHOW_CATEGORIES = frozenset({'Show Turf and Flooring', 'Electrical Distribution Equipment'})
+CREATIVE_CATEGORIES = frozenset({'Event Props'})
+AV_CATEGORIES = frozenset({'Audio', 'Video Display', 'Lighting AV', 'Presentation Aid', 'Lighting', 'Video Camera'})
+TABLETOP_KEYWORDS = ('Linen', 'Napkin', 'Flatware', 'Dishware', 'Glassware', 'Beverage Dispensers', 'Concession Equipment', 'Platters & Serving', 'Chargers')
+TABLETOP_PATTERN = re.compile('|'.join(map(re.escape, TABLETOP_KEYWORDS)))
+PARTY_CATEGORIES = frozenset({'Chairs', 'Tables', 'Miscellaneous  Party', 'Staging', 'Cooling & Heating Equipment', 'Dividers and Fencing', 'Dance Floor', 'Grills & Griddles'})
+LAV_CATEGORIES = frozenset({'Luxury Restroom & Shower Trailers', 'Refrigerator & Freezer Trailers'})
+GROUP_LABELS = ['Trade Show', 'Tent', 'Creative', 'Audio/Visual', 'Table Top', 'Party Rental', 'Lavatory']
+
+# Cleaned combined data cached next to the CSVs, and aggregates keyed by plot configuration
+COMBINED_CACHE_FILE = 'combined.parquet'
+# Bump whenever load_csv or the polars loader changes how rows are cleaned, so older caches are rebuilt
+COMBINED_CACHE_VERSION = 2
+AGG_CACHE = {}
+# Bar colors keyed by the tuple of plotted series
+COLOR_CACHE = {}
+
+# Categories plotted individually; the rest are summed into 'Other'
+TOP_CATEGORIES = 20
+
+# Options for the numba groupby kernel
+NUMBA_ENGINE_KWARGS = {'parallel': True, 'nogil': True}
+# Serializes numba launches so the background warm-up never overlaps a plot
+NUMBA_LOCK = threading.Lock()
+
+
+# Read with the pyarrow CSV reader; it has no thousands separator support, so numbers are parsed on the Arrow table
+def read_csv_pyarrow(file_path):
+    table = pa_csv.read_csv(
+        file_path,
+        read_options=pa_csv.ReadOptions(skip_rows=1, autogenerate_column_names=True),
+        convert_options=pa_csv.ConvertOptions(
+            include_columns=[f'f{i}' for i in CSV_USECOLS],
+            column_types={f'f{i}': pa.string() for i in CSV_USECOLS},
+            null_values=NA_VALUES,
+            strings_can_be_null=True
+        )
+    ).rename_columns(COLUMN_NAMES)
+    # Remove repeated header rows where 'Item Key' == 'Item Key', keeping rows without an Item Key
+    table = table.filter(pc.fill_null(pc.not_equal(table['Item Key'], 'Item Key'), True))
+    # Strip thousands separators and cast; stray text raises ArrowInvalid and load_csv falls back to the C engine
+    for col in NUMERIC_COLS:
+        numbers = pc.cast(pc.replace_substring(table[col], ',', ''), pa.float64())
+        table = table.set_column(table.schema.get_field_index(col), col, numbers)
+    return table.to_pandas(types_mapper={pa.string(): pd.StringDtype()}.get)
+
+
+# Read in bounded chunks, dropping repeated header rows from each chunk as it arrives
+def read_csv_chunked(file_path, **options):
+    with pd.read_csv(file_path, chunksize=CSV_CHUNKSIZE, **options) as reader:
+        parts = [chunk[chunk['Item Key'].ne('Item Key').fillna(True)] for chunk in reader]
+    return pd.concat(parts, ignore_index=True)
+
+
+# Read with the C engine, converting every column to its final dtype inside the tokenizer
+def read_csv_c(file_path):
+    options = dict(
+        header=0,
+        names=COLUMN_NAMES,  # Assign fixed column names
+        engine='c',
+        delimiter=',',
+        quotechar='"',  # Handle quoted fields
+        thousands=',',  # Parse commas in numbers
+        usecols=CSV_USECOLS
+    )
+    # NA markers apply to every column; repeated header rows carry the header text in numeric columns, so treat it as NA there too
+    header = pd.read_csv(file_path, nrows=0, usecols=CSV_USECOLS).columns
+    na_values = {name: NA_VALUES + [str(col)] if name in NUMERIC_COLS else NA_VALUES for name, col in zip(COLUMN_NAMES, header)}
+    try:
+        return read_csv_chunked(file_path, na_values=na_values, dtype={**dict.fromkeys(NUMERIC_COLS, 'float64'), **dict.fromkeys(STRING_COLS, 'string')}, **options)
+    except ValueError:
+        # Other stray text in a numeric column; parse it as text and coerce
+        df = read_csv_chunked(file_path, na_values=na_values, dtype=dict.fromkeys(STRING_COLS, 'string'), **options)
+        for col in NUMERIC_COLS:
+            # Columns holding text come back unparsed, thousands separators included
+            if not pd.api.types.is_numeric_dtype(df[col]):
+                df[col] = pd.to_numeric(df[col].astype('string').str.replace(',', '', regex=False), errors='coerce').astype('float64')
+        return df
+
+
+# Hash the raw file bytes for data integrity, reading in 1 MB blocks
+def file_hash(file_path):
+    hasher = hashlib.blake2b(digest_size=4)
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            hasher.update(block)
+    return hasher.hexdigest()
 
 
 # Load CSV function with robust parsing and cleaning
 def load_csv(file_path):
     try:
-        df = pd.read_csv(
-            file_path,
-            header=0,
-            skiprows=[1],  # Skip only the blank row after headers if present
-            skipfooter=0,
-            engine='python',
-            na_values=['N/A', '-', ''],
-            delimiter=',',
-            quotechar='"',  # Handle quoted fields
-            thousands=',',  # Parse commas in numbers
-            usecols=[4, 16, 17, 18, 19, 20, 21, 22, 23, 24, 25, 26]
-        )
-        # Assign fixed column names
-        df.columns = ['Category', 'Item Key', 'Name', 'Quantity', 'Purchase Cost', 'Hours', 'T/O', 'Income', 'ROI', 'Avg Yrl ROI', 'Subrental', 'Repair']
-
-        # Remove entirely empty rows and columns
+        df = None
+        if USE_PYARROW_CSV and pa_csv is not None:
+            try:
+                df = read_csv_pyarrow(file_path)
+            except (pa.ArrowInvalid, ValueError) as e:
+                print(f"pyarrow could not parse {file_path}, falling back to the C engine: {e}")
+        if df is None:
+            df = read_csv_c(file_path)
+
+        # Remove entirely empty rows and columns (this also drops the blank row after headers);
+        # both readers have already removed repeated header rows
         df = df.dropna(how='all').dropna(axis=1, how='all')
 
-        # Remove repeated header rows where 'Item Key' == 'Item Key'
-        df = df[df['Item Key'] != 'Item Key']
-
-        # Convert numeric columns to floats
-        numeric_cols = ['Quantity', 'Purchase Cost', 'Hours', 'T/O', 'Income', 'ROI', 'Avg Yrl ROI', 'Subrental', 'Repair']
-        for col in numeric_cols:
-            if col in df.columns:
-                df[col] = pd.to_numeric(df[col], errors='coerce')
-
-        # Strip whitespace from string columns
-        str_cols = ['Category', 'Item Key', 'Name']
-        for col in str_cols:
+        # Strip surrounding whitespace from string columns
+        for col in STRING_COLS:
             if col in df.columns:
                 df[col] = df[col].str.strip()
 
         # Drop any remaining rows that are all NaN in numeric columns
-        df = df.dropna(subset=numeric_cols, how='all')
+        df = df.dropna(subset=NUMERIC_COLS, how='all')
+
+        # Store Category as integer codes over string categories for fast filtering and grouping
+        if 'Category' in df.columns:
+            df['Category'] = df['Category'].astype('category')
 
+        df.attrs['source_hash'] = file_hash(file_path)
         print(f"Data imported successfully from {file_path}! Loaded {len(df)} rows.")
         return df
     except Exception as e:
@@ -57,159 +184,271 @@ def load_csv(file_path):
         return None
 
 
-# Visualize function with enhanced validation
-def visualize_data(df, text_area, canvas_frame):
-    if df is None or df.empty:
-        text_area.insert(tk.END, "No data loaded.\n")
-        return
+# Combine per-file digests, in file order, into one data hash
+def combine_hashes(hashes):
+    hasher = hashlib.blake2b(digest_size=4)
+    for file_digest in hashes:
+        hasher.update(file_digest.encode())
+    return hasher.hexdigest()
+
+
+# Load all yearly CSVs with pandas and tag each with its year
+def load_csv_files(year_files):
+    dfs = []
+    # Parse the yearly files in parallel; the C engine and pyarrow release the GIL while tokenizing
+    with ThreadPoolExecutor(max_workers=min(8, len(year_files))) as executor:
+        loaded = executor.map(load_csv, [file_path for file_path, _ in year_files])
+        for (file_path, year), single_df in zip(year_files, loaded):
+            if single_df is not None:
+                single_df['Year'] = year
+                dfs.append(single_df)
+
+    if not dfs:
+        return None
+    combined_df = pd.concat(dfs, ignore_index=True)
+    # Yearly files have different category sets, so concat falls back to strings
+    combined_df['Category'] = combined_df['Category'].astype('category')
+    combined_df.attrs['source_hash'] = combine_hashes(single_df.attrs['source_hash'] for single_df in dfs)
+    return combined_df
 
-    # Clear previous content
-    text_area.delete(1.0, tk.END)
+
+# Load all yearly CSVs with one polars lazy query, applying the same cleaning as load_csv
+def load_csv_files_polars(year_files):
+    try:
+        frames = [
+            pl.scan_csv(file_path, has_header=False, skip_rows=1, infer_schema=False, null_values=NA_VALUES, truncate_ragged_lines=True)
+            .select([pl.nth(i).alias(name) for i, name in zip(CSV_USECOLS, COLUMN_NAMES)])
+            .with_columns(pl.lit(year, dtype=pl.Int64).alias('Year'))
+            for file_path, year in year_files
+        ]
+        df = (
+            pl.concat(frames)
+            # Remove entirely empty rows and repeated header rows where 'Item Key' == 'Item Key'
+            .filter(~pl.all_horizontal(pl.col(COLUMN_NAMES).is_null()))
+            .filter(pl.col('Item Key').ne_missing('Item Key'))
+            # Strip whitespace from string columns and parse numbers, dropping thousands separators
+            .with_columns(
+                pl.col(STRING_COLS).str.strip_chars(),
+                pl.col(NUMERIC_COLS).str.replace_all(',', '', literal=True).cast(pl.Float64, strict=False)
+            )
+            # Drop any remaining rows that are all null in numeric columns
+            .filter(~pl.all_horizontal(pl.col(NUMERIC_COLS).is_null()))
+            .collect()
+            .to_pandas()
+        )
+    except Exception as e:
+        print(f"Error loading CSVs with polars, falling back to pandas: {e}")
+        return None
+
+    for col in STRING_COLS:
+        df[col] = df[col].astype('string')
+    df['Category'] = df['Category'].astype('category')
+    df.attrs['source_hash'] = combine_hashes(file_hash(file_path) for file_path, _ in year_files)
+    print(f"Data imported successfully with polars from {len(year_files)} files! Loaded {len(df)} rows.")
+    return df
+
+
+# Write to the read-only text area in a single insert, optionally replacing its content
+def write_text(text_area, text, clear=False):
+    text_area.config(state=tk.NORMAL)
+    if clear:
+        text_area.delete(1.0, tk.END)
+    text_area.insert(tk.END, text)
+    text_area.config(state=tk.DISABLED)
+
+
+# Text report of the data with enhanced validation
+def summarize_data(df):
+    parts = []
 
     # Text summaries
-    text_area.insert(tk.END, "First 5 rows:\n" + str(df.head()) + "\n\n")
-    text_area.insert(tk.END, "Last 5 rows:\n" + str(df.tail()) + "\n\n")
+    parts.append("First 5 rows:\n" + str(df.head()) + "\n\n")
+    parts.append("Last 5 rows:\n" + str(df.tail()) + "\n\n")
 
     # Capture df.info() output
     buffer = StringIO()
     df.info(buf=buffer, verbose=False)
-    text_area.insert(tk.END, "Data info:\n" + buffer.getvalue() + "\n")
-    text_area.insert(tk.END, "Summary stats:\n" + str(df.describe()) + "\n\n")
+    parts.append("Data info:\n" + buffer.getvalue() + "\n")
+    parts.append("Summary stats:\n" + str(df.describe()) + "\n\n")
 
     # Validation checks
-    text_area.insert(tk.END, "Validation Checks:\n")
-    text_area.insert(tk.END, f"Total rows: {len(df)}\n")
-    text_area.insert(tk.END, f"Total columns: {len(df.columns)}\n")
-    text_area.insert(tk.END, f"Column names: {df.columns.tolist()}\n")
-    text_area.insert(tk.END, f"Unique Categories: {df['Category'].nunique() if 'Category' in df else 'N/A'}\n")
-    text_area.insert(tk.END, f"Unique Item Keys: {df['Item Key'].nunique() if 'Item Key' in df else 'N/A'}\n")
-    text_area.insert(tk.END, f"Unique Names: {df['Name'].nunique() if 'Name' in df else 'N/A'}\n")
-    text_area.insert(tk.END, f"Total Income: {df['Income'].sum():,.2f}\n")
-    text_area.insert(tk.END, f"Missing values per column:\n{str(df.isnull().sum())}\n")
-
-    # Row hash for data integrity
-    row_hash = hashlib.md5(df.to_string().encode()).hexdigest()[:8]
-    text_area.insert(tk.END, f"Data hash (first 8 chars): {row_hash}\n\n")
-
-    # Clear previous canvas
-    for widget in canvas_frame.winfo_children():
-        widget.destroy()
-
-    # Matplotlib table viz (top 10 rows)
-    fig, ax = plt.subplots(figsize=(12, 5))  # Wider for column names
-    ax.axis('off')
-    table = Table(ax, bbox=[0, 0, 1, 1])
-
-    # Headers
-    for j, col in enumerate(df.columns):
-        table.add_cell(0, j, width=1 / len(df.columns), height=0.05, text=col, loc='center', facecolor='lightgray')
-
-    # Data rows (top 10)
-    for i in range(min(10, len(df))):
-        for j, val in enumerate(df.iloc[i]):
-            table.add_cell(i + 1, j, width=1 / len(df.columns), height=0.05, text=str(val), loc='center')
+    parts.append("Validation Checks:\n")
+    parts.append(f"Total rows: {len(df)}\n")
+    parts.append(f"Total columns: {len(df.columns)}\n")
+    parts.append(f"Column names: {df.columns.tolist()}\n")
+    parts.append(f"Unique Categories: {df['Category'].nunique() if 'Category' in df else 'N/A'}\n")
+    parts.append(f"Unique Item Keys: {df['Item Key'].nunique() if 'Item Key' in df else 'N/A'}\n")
+    parts.append(f"Unique Names: {df['Name'].nunique() if 'Name' in df else 'N/A'}\n")
+    parts.append(f"Total Income: {df['Income'].sum():,.2f}\n")
+    parts.append(f"Missing values per column:\n{str(df.isnull().sum())}\n")
 
-    ax.add_table(table)
-    fig.suptitle("Sample Data Table View")
+    # Source hash for data integrity, computed when the CSVs were loaded
+    parts.append(f"Data hash (first 8 chars): {df.attrs.get('source_hash', 'N/A')}\n\n")
 
-    canvas = FigureCanvasTkAgg(fig, master=canvas_frame)
-    canvas.draw()
-    canvas.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=1)
+    return ''.join(parts)
 
-    print(f"Visualized data! Unique categories count: {df['Category'].nunique() if 'Category' in df else 'N/A'}.")
 
-
-# Plot aggregation with optional grouping, year selection, and axis toggle
-def plot_aggregation(df, canvas_frame, group_trade_show, group_tent, group_creative, group_av, group_tabletop, group_party, group_lav, selected_years, by_year, include_trade_show, include_tent, include_creative, include_av, include_tabletop, include_party, include_lav):
+# Visualize function with enhanced validation
+def visualize_data(df, text_area, canvas):
     if df is None or df.empty:
+        write_text(text_area, "No data loaded.\n")
         return
 
-    # Filter by selected years
-    plot_df = df[df['Year'].isin(selected_years)].copy()
-    if plot_df.empty:
-        return
+    # Build the text report on a worker thread; the Tk thread polls for it so only it touches widgets
+    reports = queue.Queue()
 
-    original_unique = plot_df['Category'].nunique()
-    print(f"Starting plot with {original_unique} unique categories.")
+    def compute_report():
+        try:
+            reports.put(summarize_data(df))
+        except Exception as e:
+            reports.put(f"Error summarizing data: {e}\n")
+
+    def show_report():
+        try:
+            report = reports.get_nowait()
+        except queue.Empty:
+            text_area.after(50, show_report)
+            return
+        # Replace previous content with the whole report in one insert
+        write_text(text_area, report, clear=True)
 
-    # Exclude categories based on include checkboxes
-    if not include_trade_show:
-        plot_df = plot_df[~plot_df['Category'].apply(lambda x: isinstance(x, str) and ('Trade Show' in x or x == 'Show Turf and Flooring' or x == 'Electrical Distribution Equipment'))]
-        print("Excluded Trade Show categories.")
+    write_text(text_area, "Computing data summary...\n", clear=True)
+    threading.Thread(target=compute_report, daemon=True).start()
+    text_area.after(50, show_report)
 
-    if not include_tent:
-        plot_df = plot_df[~plot_df['Category'].apply(lambda x: isinstance(x, str) and 'Tent' in x)]
-        print("Excluded Tent categories.")
+    # Matplotlib table viz (top 10 rows), redrawn on the persistent figure
+    fig = canvas.figure
+    fig.clear()
+    ax = fig.add_subplot()
+    ax.axis('off')
 
-    if not include_creative:
-        plot_df = plot_df[~plot_df['Category'].apply(lambda x: isinstance(x, str) and ('Creative' in x or x == 'Event Props'))]
-        print("Excluded Creative categories.")
+    # Headers and data rows (top 10), built from one string array
+    # Never index rows with df.iloc[i] in a Python loop: each call boxes the row into a new Series
+    cell_text = df.head(10).astype(str).to_numpy()
+    ax.table(cellText=cell_text, colLabels=df.columns.tolist(), colColours=['lightgray'] * len(df.columns),
+             cellLoc='center', bbox=[0, 0, 1, 1])
+    fig.suptitle("Sample Data Table View")
+    canvas.draw_idle()
 
-    if not include_av:
-        av_categories = ['Audio', 'Video Display', 'Lighting AV', 'Presentation Aid', 'Lighting', 'Video Camera']
-        plot_df = plot_df[~plot_df['Category'].apply(lambda x: isinstance(x, str) and x in av_categories)]
-        print("Excluded Audio/Visual categories.")
+    print(f"Visualized data! Unique categories count: {df['Category'].nunique() if 'Category' in df else 'N/A'}.")
 
-    if not include_tabletop:
-        tabletop_keywords = ['Linen', 'Napkin', 'Flatware', 'Dishware', 'Glassware', 'Beverage Dispensers', 'Concession Equipment', 'Platters & Serving', 'Chargers']
-        plot_df = plot_df[~plot_df['Category'].apply(lambda x: isinstance(x, str) and any(kw in x for kw in tabletop_keywords))]
-        print("Excluded Table Top categories.")
 
-    if not include_party:
-        party_categories = ['Chairs', 'Tables', 'Miscellaneous  Party', 'Staging', 'Cooling & Heating Equipment', 'Dividers and Fencing', 'Dance Floor', 'Grills & Griddles']
-        plot_df = plot_df[~plot_df['Category'].apply(lambda x: isinstance(x, str) and x in party_categories)]
-        print("Excluded Party Rental categories.")
+# Group labels whose family contains the given raw category, in grouping priority order
+def category_families(category):
+    families = []
+    if 'Trade Show' in category or category in TRADE_SHOW_CATEGORIES:
+        families.append('Trade Show')
+    if 'Tent' in category:
+        families.append('Tent')
+    if 'Creative' in category or category in CREATIVE_CATEGORIES:
+        families.append('Creative')
+    if category in AV_CATEGORIES:
+        families.append('Audio/Visual')
+    if TABLETOP_PATTERN.search(category):
+        families.append('Table Top')
+    if category in PARTY_CATEGORIES:
+        families.append('Party Rental')
+    if category in LAV_CATEGORIES:
+        families.append('Lavatory')
+    return families
+
+
+# Sum Income per group, using pandas' compiled numba kernel when numba is installed
+def sum_income(plot_df, keys):
+    grouped = plot_df.groupby(keys, observed=True, sort=False)['Income']
+    if numba is None:
+        return grouped.sum()
+    with NUMBA_LOCK:
+        return grouped.sum(engine='numba', engine_kwargs=NUMBA_ENGINE_KWARGS)
+
+
+# Compile the numba groupby kernel ahead of the first plot; run on a background thread so startup is not delayed
+def warm_sum_income():
+    if numba is not None:
+        sum_income(pd.DataFrame({'Year': [0], 'Category': pd.Categorical(['']), 'Income': [0.0]}), ['Year', 'Category'])
+
+
+# Aggregate income per Year and Category with optional grouping and year selection; the same result serves both axes
+def aggregate_income(df, group_trade_show, group_tent, group_creative, group_av, group_tabletop, group_party, group_lav, selected_years, include_trade_show, include_tent, include_creative, include_av, include_tabletop, include_party, include_lav):
+    # Filter by selected years, keeping only the columns the aggregation uses
+    plot_df = df.loc[df['Year'].isin(selected_years), ['Category', 'Year', 'Income']]
+    if plot_df.empty:
+        return None
 
-    if not include_lav:
-        lav_categories = ['Luxury Restroom & Shower Trailers', 'Refrigerator & Freezer Trailers']
-        plot_df = plot_df[~plot_df['Category'].apply(lambda x: isinstance(x, str) and x in lav_categories)]
-        print("Excluded Lavatory categories.")
+    original_unique = plot_df['Category'].nunique()
+    print(f"Starting plot with {original_unique} unique categories.")
 
-    # Apply groupings only if included and group checked
-    if group_trade_show and include_trade_show:
-        plot_df['Category'] = plot_df['Category'].apply(lambda x: 'Trade Show' if isinstance(x, str) and ('Trade Show' in x or x == 'Show Turf and Flooring' or x == 'Electrical Distribution Equipment') else x)
-        print("Grouped Trade Show categories.")
+    include_flags = {'Trade Show': include_trade_show, 'Tent': include_tent, 'Creative': include_creative, 'Audio/Visual': include_av,
+                     'Table Top': include_tabletop, 'Party Rental': include_party, 'Lavatory': include_lav}
+    group_flags = {'Trade Show': group_trade_show, 'Tent': group_tent, 'Creative': group_creative, 'Audio/Visual': group_av,
+                   'Table Top': group_tabletop, 'Party Rental': group_party, 'Lavatory': group_lav}
+
+    # Resolve every distinct category once, then apply the result to all rows in a single pass
+    remap = {}
+    excluded = set()
+    for category in plot_df['Category'].cat.categories:
+        families = category_families(category)
+        if any(not include_flags[label] for label in families):
+            excluded.add(category)
+        # Groupings apply only if included and group checked; the first matching group wins
+        remap[category] = next((label for label in families if group_flags[label]), category)
+
+    for label in GROUP_LABELS:
+        if not include_flags[label]:
+            print(f"Excluded {label} categories.")
+    for label in GROUP_LABELS:
+        if group_flags[label] and include_flags[label]:
+            print(f"Grouped {label} categories.")
+
+    if excluded:
+        plot_df = plot_df[~plot_df['Category'].isin(excluded)]
+    plot_df['Category'] = plot_df['Category'].map(remap).astype('category')
 
-    if group_tent and include_tent:
-        plot_df['Category'] = plot_df['Category'].apply(lambda x: 'Tent' if isinstance(x, str) and 'Tent' in x else x)
-        print("Grouped Tent categories.")
+    updated_unique = plot_df['Category'].nunique()
+    print(f"After grouping, unique categories: {updated_unique}. Reduction by {original_unique - updated_unique}.")
 
-    if group_creative and include_creative:
-        plot_df['Category'] = plot_df['Category'].apply(lambda x: 'Creative' if isinstance(x, str) and ('Creative' in x or x == 'Event Props') else x)
-        print("Grouped Creative categories.")
+    # Keep the top categories by income and fold the long tail into 'Other' before the full aggregation
+    if updated_unique > TOP_CATEGORIES:
+        top = sum_income(plot_df, ['Category']).nlargest(TOP_CATEGORIES).index
+        category = plot_df['Category']
+        if 'Other' not in category.cat.categories:
+            category = category.cat.add_categories('Other')
+        plot_df['Category'] = category.where(category.isin(top) | category.isna(), 'Other').cat.remove_unused_categories()
+        print(f"Folded {updated_unique - len(top)} categories outside the top {TOP_CATEGORIES} into Other.")
 
-    if group_av and include_av:
-        av_categories = ['Audio', 'Video Display', 'Lighting AV', 'Presentation Aid', 'Lighting', 'Video Camera']
-        plot_df['Category'] = plot_df['Category'].apply(lambda x: 'Audio/Visual' if isinstance(x, str) and x in av_categories else x)
-        print("Grouped Audio/Visual categories.")
+    # Sort categories by label; after a one-to-one remap or the fold, new labels keep the old category slots
+    category = plot_df['Category'].cat.remove_unused_categories()
+    plot_df['Category'] = category.cat.reorder_categories(sorted(category.cat.categories))
 
-    if group_tabletop and include_tabletop:
-        tabletop_keywords = ['Linen', 'Napkin', 'Flatware', 'Dishware', 'Glassware', 'Beverage Dispensers', 'Concession Equipment', 'Platters & Serving', 'Chargers']
-        plot_df['Category'] = plot_df['Category'].apply(lambda x: 'Table Top' if isinstance(x, str) and any(kw in x for kw in tabletop_keywords) else x)
-        print("Grouped Table Top categories.")
+    return sum_income(plot_df, ['Year', 'Category'])
 
-    if group_party and include_party:
-        party_categories = ['Chairs', 'Tables', 'Miscellaneous  Party', 'Staging', 'Cooling & Heating Equipment', 'Dividers and Fencing', 'Dance Floor', 'Grills & Griddles']
-        plot_df['Category'] = plot_df['Category'].apply(lambda x: 'Party Rental' if isinstance(x, str) and x in party_categories else x)
-        print("Grouped Party Rental categories.")
 
-    if group_lav and include_lav:
-        lav_categories = ['Luxury Restroom & Shower Trailers', 'Refrigerator & Freezer Trailers']
-        plot_df['Category'] = plot_df['Category'].apply(lambda x: 'Lavatory' if isinstance(x, str) and x in lav_categories else x)
-        print("Grouped Lavatory categories.")
+# Plot aggregation, reusing the aggregate of any configuration already plotted for this data
+def plot_aggregation(df, canvas, group_trade_show, group_tent, group_creative, group_av, group_tabletop, group_party, group_lav, selected_years, by_year, include_trade_show, include_tent, include_creative, include_av, include_tabletop, include_party, include_lav):
+    if df is None or df.empty:
+        return
 
-    updated_unique = plot_df['Category'].nunique()
-    print(f"After grouping, unique categories: {updated_unique}. Reduction by {original_unique - updated_unique}.")
+    # The axis only changes how the aggregate is laid out, so it is not part of the key
+    key = (id(df), tuple(sorted(selected_years)),
+           group_trade_show, group_tent, group_creative, group_av, group_tabletop, group_party, group_lav,
+           include_trade_show, include_tent, include_creative, include_av, include_tabletop, include_party, include_lav)
+    if key not in AGG_CACHE:
+        AGG_CACHE[key] = aggregate_income(df, group_trade_show, group_tent, group_creative, group_av, group_tabletop, group_party, group_lav, selected_years, include_trade_show, include_tent, include_creative, include_av, include_tabletop, include_party, include_lav)
+    income = AGG_CACHE[key]
+    if income is None:
+        return
 
-    # Aggregate based on axis choice
+    # Lay out the aggregate based on axis choice
     if by_year:
-        agg_df = plot_df.groupby(['Year', 'Category'])['Income'].sum().unstack(fill_value=0)
-        agg_df = agg_df.sort_index(ascending=True)  # Sort years chronologically
+        agg_df = income.unstack('Category', fill_value=0).sort_index(axis=1)
+        if not agg_df.index.is_monotonic_increasing:
+            agg_df = agg_df.sort_index(ascending=True)  # Sort years chronologically
         x_label = "Year"
         title = "Total Income by Year and Category (Chronological)"
     else:
-        agg_df = plot_df.groupby(['Category', 'Year'])['Income'].sum().unstack(fill_value=0)
-        agg_df = agg_df.loc[agg_df.sum(axis=1).sort_values(ascending=False).index]  # Sort categories by total income
+        agg_df = income.unstack('Year', fill_value=0).sort_index(axis=1)
+        totals = agg_df.to_numpy().sum(axis=1)
+        agg_df = agg_df.take(np.argsort(-totals, kind='stable'))  # Sort categories by total income
         x_label = "Category"
         title = "Total Income by Category and Year (Sorted)"
 
@@ -228,26 +467,66 @@ def plot_aggregation(df, canvas_frame, group_trade_show, group_tent, group_creat
     if group_lav and include_lav:
         title += " - Lavatories Grouped"
 
-    # Create grouped bar chart
-    fig, ax = plt.subplots(figsize=(12, 6))
-    agg_df.plot(kind='bar', ax=ax, color=plt.cm.Paired(range(len(agg_df.columns))))
+    # Create grouped bar chart on the persistent figure
+    fig = canvas.figure
+    fig.clear()
+    ax = fig.add_subplot()
+    # Colors depend only on the plotted series, so reuse them and keep them stable across re-plots
+    color_key = tuple(agg_df.columns)
+    if color_key not in COLOR_CACHE:
+        COLOR_CACHE[color_key] = plt.cm.Paired(np.linspace(0, 1, len(color_key)))
+    agg_df.plot(kind='bar', ax=ax, color=COLOR_CACHE[color_key])
     ax.set_title(title)
     ax.set_xlabel(x_label)
     ax.set_ylabel("Income ($)")
     ax.yaxis.set_major_formatter(ticker.FuncFormatter(lambda x, pos: f'{x:,.0f}'))
-    plt.xticks(rotation=45, ha='right', fontsize=7)
-    plt.legend(title='Category' if by_year else 'Year')
-    plt.tight_layout(rect=[0.05, 0.05, 0.95, 0.95])
+    plt.setp(ax.get_xticklabels(), rotation=45, ha='right', fontsize=7)
+    ax.legend(title='Category' if by_year else 'Year')
+    fig.tight_layout(rect=[0.05, 0.05, 0.95, 0.95])
+    canvas.draw_idle()
 
-    # Clear previous canvas
-    for widget in canvas_frame.winfo_children():
-        widget.destroy()
+    print("Plot rendered! Total income summed: {0:,.2f}.".format(agg_df.sum().sum()))
 
-    canvas = FigureCanvasTkAgg(fig, master=canvas_frame)
-    canvas.draw()
-    canvas.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=1)
 
-    print("Plot rendered! Total income summed: {0:,.2f}.".format(agg_df.sum().sum()))
+# Name, size and modification time of each source CSV; the cache is only valid for an identical list
+def source_manifest(csv_paths):
+    manifest = []
+    for file_path in csv_paths:
+        stat = os.stat(file_path)
+        manifest.append([os.path.basename(file_path), stat.st_size, stat.st_mtime_ns])
+    return manifest
+
+
+# Load the cleaned combined data cached next to the CSVs, unless it predates the current cleaning or the source CSVs changed
+def read_combined_cache(cache_path, csv_paths):
+    if not csv_paths or not os.path.exists(cache_path):
+        return None
+    try:
+        df = pd.read_parquet(cache_path)
+    except Exception as e:
+        print(f"Error loading cache {cache_path}: {e}")
+        return None
+    if df.attrs.get('cache_version') != COMBINED_CACHE_VERSION:
+        print(f"Cache {cache_path} was written by an older version; reloading the CSV files.")
+        return None
+    if df.attrs.get('source_files') != source_manifest(csv_paths):
+        print(f"Cache {cache_path} does not match the current CSV files; reloading them.")
+        return None
+    print(f"Data imported successfully from cache {cache_path}! Loaded {len(df)} rows.")
+    return df
+
+
+# Cache the cleaned combined data as Parquet, recording the source CSVs; skipped when pyarrow is not installed
+def write_combined_cache(df, cache_path, csv_paths):
+    if pa is None:
+        return
+    df.attrs['cache_version'] = COMBINED_CACHE_VERSION
+    df.attrs['source_files'] = source_manifest(csv_paths)
+    try:
+        df.to_parquet(cache_path, engine='pyarrow', compression='zstd', index=False)
+        print(f"Cached combined data to {cache_path}. File size in bytes: {os.path.getsize(cache_path)}.")
+    except Exception as e:
+        print(f"Error caching combined data to {cache_path}: {e}")
 
 
 # Export cleaned DF to CSV
@@ -353,39 +632,50 @@ def create_ui():
     canvas_frame = tk.Frame(root)
     canvas_frame.grid(row=0, column=1, sticky='nsew', padx=10, pady=10)
 
+    # One persistent figure and canvas, redrawn in place by the table view and the plot
+    canvas = FigureCanvasTkAgg(Figure(figsize=(12, 6)), master=canvas_frame)
+    canvas.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=1)
+
     # Text area for summaries (bottom right)
     text_frame = tk.Frame(root)
     text_frame.grid(row=1, column=1, sticky='ew', padx=10, pady=10)
     scrollbar = Scrollbar(text_frame)
     scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-    text_area = Text(text_frame, wrap=tk.WORD, yscrollcommand=scrollbar.set, height=5)
+    text_area = Text(text_frame, wrap=tk.WORD, yscrollcommand=scrollbar.set, height=5, state=tk.DISABLED)
     text_area.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
     scrollbar.config(command=text_area.yview)
 
     def load_all_data(root):
         data_path = r"G:\expo\Software\NumberCruncher\data\csv"
         if not os.path.exists(data_path):
-            text_area.insert(tk.END, f"Data path not found: {data_path}\n")
+            write_text(text_area, f"Data path not found: {data_path}\n")
             return
 
         csv_files = [f for f in os.listdir(data_path) if f.endswith('.csv') and 'All_Items_' in f]
-        dfs = []
+        year_files = []
         for file in sorted(csv_files):
-            file_path = os.path.join(data_path, file)
             year_match = re.search(r'(\d{4})', file)
             if year_match:
-                year = int(year_match.group(1))
-                single_df = load_csv(file_path)
-                if single_df is not None:
-                    single_df['Year'] = year
-                    dfs.append(single_df)
-
-        if dfs:
-            combined_df = pd.concat(dfs, ignore_index=True)
-            visualize_data(combined_df, text_area, canvas_frame)
+                year_files.append((os.path.join(data_path, file), int(year_match.group(1))))
+
+        cache_path = os.path.join(data_path, COMBINED_CACHE_FILE)
+        csv_paths = [file_path for file_path, _ in year_files]
+        combined_df = read_combined_cache(cache_path, csv_paths)
+
+        if combined_df is None and year_files:
+            if USE_POLARS and pl is not None:
+                combined_df = load_csv_files_polars(year_files)
+            if combined_df is None:
+                combined_df = load_csv_files(year_files)
+            if combined_df is not None:
+                write_combined_cache(combined_df, cache_path, csv_paths)
+
+        if combined_df is not None:
+            AGG_CACHE.clear()
+            visualize_data(combined_df, text_area, canvas)
             def plot_cmd():
                 selected = [yr for yr, var in year_vars.items() if var.get()]
-                plot_aggregation(combined_df, canvas_frame, bool(group_trade_var.get()), bool(group_tent_var.get()), bool(group_creative_var.get()), bool(group_av_var.get()), bool(group_tabletop_var.get()), bool(group_party_var.get()), bool(group_lav_var.get()), selected, bool(axis_var.get()), bool(include_trade_var.get()), bool(include_tent_var.get()), bool(include_creative_var.get()), bool(include_av_var.get()), bool(include_tabletop_var.get()), bool(include_party_var.get()), bool(include_lav_var.get()))
+                plot_aggregation(combined_df, canvas, bool(group_trade_var.get()), bool(group_tent_var.get()), bool(group_creative_var.get()), bool(group_av_var.get()), bool(group_tabletop_var.get()), bool(group_party_var.get()), bool(group_lav_var.get()), selected, bool(axis_var.get()), bool(include_trade_var.get()), bool(include_tent_var.get()), bool(include_creative_var.get()), bool(include_av_var.get()), bool(include_tabletop_var.get()), bool(include_party_var.get()), bool(include_lav_var.get()))
             plot_button.config(state=tk.NORMAL, command=plot_cmd)
             export_button.config(state=tk.NORMAL, command=lambda: export_csv(combined_df))
 
@@ -394,6 +684,9 @@ def create_ui():
         axis_button.config(text="Switch to Year Axis" if axis_var.get() == 0 else "Switch to Category Axis")
         plot_button.invoke()  # Trigger plot update
 
+    # Warm the numba kernel once the window is up
+    root.after(0, lambda: threading.Thread(target=warm_sum_income, daemon=True).start())
+
     root.mainloop()
 
 